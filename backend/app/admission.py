@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# ----------------------------
+# Admission control for the recommendation path
+# ----------------------------
+# Full recommendations run the sentence encoder, so only a few may run at
+# once. Extra requests wait in a bounded queue; a request is shed as soon as
+# it could no longer finish within its deadline, and then served by a
+# cheaper tier (cache, popularity ranking) or rejected with a 503.
+MAX_CONCURRENT = int(os.getenv("RECOMMEND_MAX_CONCURRENT", "4"))
+MAX_QUEUE = int(os.getenv("RECOMMEND_MAX_QUEUE", "16"))
+DEADLINE_SECONDS = float(os.getenv("RECOMMEND_DEADLINE_SECONDS", "2.0"))
+DEGRADED_MAX_CONCURRENT = int(os.getenv("RECOMMEND_DEGRADED_MAX_CONCURRENT", "32"))
+RETRY_AFTER_SECONDS = int(os.getenv("RECOMMEND_RETRY_AFTER_SECONDS", "2"))
+
+CACHE_SIZE = 4096
+CACHE_TTL_SECONDS = 300
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue and deadline-aware shedding.
+    Must be used from the event loop, so waiting requests do not hold
+    threadpool threads.
+    """
+
+    def __init__(self, max_concurrent, max_queue, initial_estimate=0.2, max_estimate=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.active = 0
+        self.service_estimate = initial_estimate  # EWMA of completed run times
+        self.max_estimate = max_estimate  # keeps one slow burst from shedding everything
+        self._semaphore = None
+
+    async def acquire(self, deadline, reserve=0.0):
+        """
+        Return True once admitted, or False if the request should be shed.
+        `reserve` is time to leave before the deadline for a fallback tier.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            return False
+
+        # When idle, always admit: running is the only way a stale (too high)
+        # estimate gets corrected, otherwise the tier could stay shut for good
+        if self.active == 0 and not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self.active += 1
+            return True
+
+        # Give up waiting once there is no longer time left to do the work
+        budget = deadline - time.monotonic() - self.service_estimate - reserve
+        if budget <= 0:
+            return False
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=budget)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+        if deadline - time.monotonic() < self.service_estimate + reserve:
+            self._semaphore.release()
+            return False
+        self.active += 1
+        return True
+
+    def release(self, elapsed=None):
+        if elapsed is not None:
+            self.service_estimate = 0.8 * self.service_estimate + 0.2 * elapsed
+            if self.max_estimate is not None:
+                self.service_estimate = min(self.service_estimate, self.max_estimate)
+        self.active -= 1
+        self._semaphore.release()
+
+
+class ResultCache:
+    """Small thread-safe LRU of recent responses with a TTL."""
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict_user(self, user_id):
+        """Drop every entry for `user_id` (keys start with the user id)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+
+full_limiter = AdmissionController(MAX_CONCURRENT, MAX_QUEUE, max_estimate=DEADLINE_SECONDS / 2)
+# The popularity ranking is a few numpy ops over the catalog plus one DB query
+degraded_limiter = AdmissionController(
+    DEGRADED_MAX_CONCURRENT, 0, initial_estimate=0.02, max_estimate=DEADLINE_SECONDS / 4
+)
+result_cache = ResultCache()
+
+# Which tier served each request: "full", "cache", "popular" or "rejected"
+tier_counts = Counter()
+
+
+def record_tier(tier):
+    tier_counts[tier] += 1
+
+
+def stats():
+    return {
+        "tiers": dict(tier_counts),
+        "active": full_limiter.active,
+        "queued": full_limiter.waiting,
+        "service_estimate_seconds": round(full_limiter.service_estimate, 3),
+        "max_concurrent": MAX_CONCURRENT,
+        "max_queue": MAX_QUEUE,
+        "deadline_seconds": DEADLINE_SECONDS,
+    }
@@ -1,56 +1,389 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from surprise import Dataset, Reader, KNNBasic
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from . import models, database
+from . import models, database, snapshot
 
 model = None  # Global model object
 
+# "knn" (Surprise KNNBasic, user-based) or "als" (implicit matrix factorization)
+CF_BACKEND = os.getenv("CF_BACKEND", "knn").lower()
+
+# With ALS, feedback is folded into the model right away and full refits
+# run in the background at most this often
+ALS_RETRAIN_INTERVAL_SECONDS = int(os.getenv("ALS_RETRAIN_INTERVAL_SECONDS", "600"))
+_retrain_lock = threading.Lock()
+_fold_lock = threading.Lock()
+_last_train = 0.0
+
+
+# Rows fetched per round trip when streaming feedback for training
+YIELD_PER = 10000
+
+FEEDBACK_SCORES = {"like": 1.0, "click": 0.8, "dislike": 0.0}
+
 
 def feedback_to_score(feedback_type: str) -> float:
-    if feedback_type == "like":
-        return 1.0
-    elif feedback_type == "click":
-        return 0.8
-    elif feedback_type == "dislike":
-        return 0.0
-    return 0.5
+    return FEEDBACK_SCORES.get(feedback_type, 0.5)
+
+
+class ImplicitALS:
+    """
+    Implicit-feedback matrix factorization (Hu, Koren & Volinsky ALS).
+
+    Likes and clicks are positive preferences with confidence
+    1 + alpha * score; dislikes are confident negatives. Memory is
+    O((users + items) * factors) instead of KNN's O(users^2), and the item
+    factors go into a FAISS inner-product index so candidates for a user
+    can be retrieved directly.
+    """
+
+    # Target number of interactions handled per solver task
+    NNZ_BLOCK = 262144
+    # Catalogs larger than this use HNSW instead of an exact flat index
+    HNSW_MIN_ITEMS = 50000
+
+    def __init__(self, factors=32, regularization=0.1, alpha=10.0, iterations=10,
+                 cg_steps=3, num_threads=None, random_state=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.random_state = random_state
+
+        self.user_ids = None
+        self.item_ids = None
+        self.user_factors = None
+        self.item_factors = None
+        self.user_index = {}
+        self.item_index = {}
+        self.index = None
+
+    def fit(self, user_ids, movie_ids, scores):
+        user_ids = np.asarray(user_ids)
+        movie_ids = np.asarray(movie_ids)
+        scores = np.asarray(scores, dtype=np.float32)
+
+        self.user_ids, users = np.unique(user_ids, return_inverse=True)
+        self.item_ids, items = np.unique(movie_ids, return_inverse=True)
+        n_users, n_items = len(self.user_ids), len(self.item_ids)
+        users, items, conf, pref = self._prepare(users, items, scores, n_items)
+
+        by_user = self._compress(users, items, n_users)
+        by_item = self._compress(items, users, n_items)
+
+        rng = np.random.default_rng(self.random_state)
+        self.user_factors = (rng.standard_normal((n_users, self.factors)) * 0.01).astype(np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.factors)) * 0.01).astype(np.float32)
+
+        with ThreadPoolExecutor(max_workers=self.num_threads) as pool:
+            for _ in range(self.iterations):
+                self._solve(pool, self.user_factors, self.item_factors, by_user, conf, pref)
+                self._solve(pool, self.item_factors, self.user_factors, by_item, conf, pref)
+
+        self.user_index = {u: i for i, u in enumerate(self.user_ids.tolist())}
+        self.item_index = {m: i for i, m in enumerate(self.item_ids.tolist())}
+        self._build_index()
+        return self
+
+    def fold_in(self, user_ids, movie_ids, scores):
+        """
+        Re-solve the factors of the given users from their full feedback
+        histories with the item factors held fixed. New users are appended;
+        movies unknown to the model are ignored until the next full fit.
+        """
+        user_ids = np.asarray(user_ids)
+        scores = np.asarray(scores, dtype=np.float32)
+        items = np.array([self.item_index.get(m, -1) for m in np.asarray(movie_ids).tolist()], dtype=np.int64)
+        known = items >= 0
+        if not known.any():
+            return
+
+        fold_ids, users = np.unique(user_ids[known], return_inverse=True)
+        users, items, conf, pref = self._prepare(users, items[known], scores[known], len(self.item_ids))
+        layout = self._compress(users, items, len(fold_ids))
+
+        # Warm-start existing users from their current factors
+        rows = np.array([self.user_index.get(u, -1) for u in fold_ids.tolist()], dtype=np.int64)
+        factors = np.zeros((len(fold_ids), self.factors), dtype=np.float32)
+        factors[rows >= 0] = self.user_factors[rows[rows >= 0]]
+
+        with ThreadPoolExecutor(max_workers=self.num_threads) as pool:
+            self._solve(pool, factors, self.item_factors, layout, conf, pref)
+
+        self.user_factors[rows[rows >= 0]] = factors[rows >= 0]
+        new_ids = fold_ids[rows < 0]
+        if len(new_ids):
+            start = len(self.user_ids)
+            self.user_factors = np.vstack([self.user_factors, factors[rows < 0]])
+            self.user_ids = np.concatenate([self.user_ids, new_ids])
+            self.user_index.update({u: start + i for i, u in enumerate(new_ids.tolist())})
+
+    def _prepare(self, users, items, scores, n_items):
+        # Keep only the latest feedback per (user, item) pair
+        keys = users.astype(np.int64) * n_items + items
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - last
+        users, items, scores = users[keep], items[keep], scores[keep]
+
+        pref = (scores > 0.5).astype(np.float32)
+        conf = (self.alpha * np.where(pref > 0, scores, 1.0)).astype(np.float32)
+        return users, items, conf, pref
+
+    @staticmethod
+    def _compress(rows, cols, n_rows):
+        # CSR-style layout; `order` maps back to the shared conf/pref arrays
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return indptr, cols[order], order
+
+    def _solve(self, pool, factors, fixed, layout, conf, pref):
+        """
+        Update `factors` in place with a few conjugate-gradient steps per row
+        (warm-started from the previous iteration). Only O(nnz * factors)
+        work and memory, so no per-row factors x factors systems are formed.
+        """
+        indptr, indices, order = layout
+        n_rows = len(indptr) - 1
+        gram = fixed.T @ fixed + self.regularization * np.eye(self.factors, dtype=np.float32)
+
+        # Split rows into tasks of roughly NNZ_BLOCK interactions each
+        targets = np.arange(0, indptr[-1], self.NNZ_BLOCK)
+        bounds = np.unique(np.r_[np.searchsorted(indptr, targets, side="right") - 1, n_rows])
+
+        def solve_block(start, stop):
+            lo, hi = indptr[start], indptr[stop]
+            block_indptr = indptr[start:stop + 1] - lo
+            rows = np.repeat(np.arange(stop - start), np.diff(block_indptr))
+            cols = indices[lo:hi]
+            c = conf[order[lo:hi]]
+            p = pref[order[lo:hi]]
+            Y = fixed[cols]
+
+            def sparse_rows(data):
+                return sparse.csr_matrix((data, cols, block_indptr), shape=(stop - start, len(fixed)))
+
+            def weighted_sum(v):
+                # sum_n c_n (y_n . v_row) y_n for every row
+                dots = np.einsum("nk,nk->n", Y, v[rows])
+                return sparse_rows(c * dots) @ fixed
+
+            x = factors[start:stop]
+            b = sparse_rows((1.0 + c) * p) @ fixed
+
+            r = b - x @ gram - weighted_sum(x)
+            d = r.copy()
+            rs_old = np.einsum("ij,ij->i", r, r)
+            for _ in range(self.cg_steps):
+                Ad = d @ gram + weighted_sum(d)
+                denom = np.einsum("ij,ij->i", d, Ad)
+                step = np.divide(rs_old, denom, out=np.zeros_like(rs_old), where=denom > 0)
+                x += step[:, None] * d
+                r -= step[:, None] * Ad
+                rs_new = np.einsum("ij,ij->i", r, r)
+                beta = np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=rs_old > 0)
+                d = r + beta[:, None] * d
+                rs_old = rs_new
+
+        list(pool.map(solve_block, bounds[:-1], bounds[1:]))
+
+    def _build_index(self):
+        if len(self.item_ids) >= self.HNSW_MIN_ITEMS:
+            self.index = faiss.IndexHNSWFlat(self.factors, 32, faiss.METRIC_INNER_PRODUCT)
+        else:
+            self.index = faiss.IndexFlatIP(self.factors)
+        self.index.add(self.item_factors)
+
+    def __getstate__(self):
+        # FAISS indexes are not picklable; rebuild from the item factors on load
+        state = self.__dict__.copy()
+        state["index"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.item_factors is not None:
+            self._build_index()
+
+    def score(self, user_id, movie_id):
+        u = self.user_index.get(user_id)
+        i = self.item_index.get(movie_id)
+        if u is None or i is None:
+            return 0.0
+        return float(np.clip(self.user_factors[u] @ self.item_factors[i], 0.0, 1.0))
+
+    def recommend(self, user_id, top_k=10):
+        """Top items for a user by inner product of the factors, as (movie_id, score) pairs."""
+        u = self.user_index.get(user_id)
+        if u is None or self.index is None:
+            return []
+        k = min(top_k, len(self.item_ids))
+        scores, indices = self.index.search(self.user_factors[u:u + 1], k)
+        return [(int(self.item_ids[i]), float(s)) for s, i in zip(scores[0], indices[0]) if i >= 0]
 
 
 # Load feedbacks from DB
-def load_feedbacks_from_db():
+def load_feedback_arrays(since=None, until=None, after_id=None, user_ids=None):
+    """
+    Stream (user_id, movie_id, score) columns into preallocated arrays.
+
+    Only the three needed columns are selected and rows are fetched through a
+    server-side cursor in YIELD_PER batches, so no ORM objects or per-row dicts
+    are built. `since` / `until` restrict to a timestamp window, `after_id`
+    to rows newer than a given Feedback.id and `user_ids` to some users.
+
+    Returns:
+        (user_ids int32, movie_ids int32, scores float32, max_feedback_id)
+    """
+    filters = []
+    if since is not None:
+        filters.append(models.Feedback.timestamp >= since)
+    if until is not None:
+        filters.append(models.Feedback.timestamp < until)
+    if after_id is not None:
+        filters.append(models.Feedback.id > after_id)
+    if user_ids is not None:
+        filters.append(models.Feedback.user_id.in_([int(u) for u in user_ids]))
+
     db: Session = database.SessionLocal()
-    feedbacks = db.query(models.Feedback).all()
-    db.close()
+    try:
+        # Size the arrays and bound by id first. The two statements are not one
+        # snapshot, so a smaller id committed in between can still show up;
+        # the arrays grow if that happens.
+        count, max_id = db.execute(
+            select(func.count(models.Feedback.id), func.max(models.Feedback.id)).where(*filters)
+        ).one()
+
+        user_ids = np.empty(count, dtype=np.int32)
+        movie_ids = np.empty(count, dtype=np.int32)
+        scores = np.empty(count, dtype=np.float32)
+        if count == 0:
+            return user_ids, movie_ids, scores, None
+
+        stmt = (
+            select(models.Feedback.user_id, models.Feedback.movie_id, models.Feedback.feedback_type)
+            .where(models.Feedback.id <= max_id, *filters)
+            .order_by(models.Feedback.id)  # chronological; ImplicitALS keeps the last per pair
+            .execution_options(yield_per=YIELD_PER)
+        )
+        filled = 0
+        for batch in db.execute(stmt).partitions():
+            users, movies, types = zip(*batch)
+            end = filled + len(batch)
+            if end > len(user_ids):
+                capacity = max(end, 2 * len(user_ids))
+                user_ids, movie_ids, scores = (_grow(a, capacity) for a in (user_ids, movie_ids, scores))
+            user_ids[filled:end] = users
+            movie_ids[filled:end] = movies
+            scores[filled:end] = [FEEDBACK_SCORES.get(t, 0.5) for t in types]
+            filled = end
+    finally:
+        db.close()
+
+    # Rows deleted while streaming leave the tail unused
+    return user_ids[:filled], movie_ids[:filled], scores[:filled], max_id
+
 
-    return pd.DataFrame([{
-        "user_id": feedback.user_id,
-        "movie_id": feedback.movie_id,
-        "feedback": feedback_to_score(feedback.feedback_type)
-    } for feedback in feedbacks])
+def _grow(array, capacity):
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
 
 
-def retrain_cf_model():
-    global model
-    df = load_feedbacks_from_db()
-    
-    if df.empty:
+def train_cf_model(user_ids, movie_ids, scores):
+    """Fit the configured CF backend on parallel id/score arrays."""
+    global model, _last_train
+
+    _last_train = time.time()
+
+    if len(user_ids) == 0:
         model = None
         return  # Avoid training on empty data
 
+    if CF_BACKEND == "als":
+        model = ImplicitALS().fit(user_ids, movie_ids, scores)
+        return
+
+    df = pd.DataFrame({"user_id": user_ids, "movie_id": movie_ids, "feedback": scores})
     reader = Reader(rating_scale=(0, 1))
-    data = Dataset.load_from_df(df[["user_id", "movie_id", "feedback"]], reader)
+    data = Dataset.load_from_df(df, reader)
     trainset = data.build_full_trainset()
 
-    model = KNNBasic(sim_options={"user_based": True})
-    model.fit(trainset)
+    knn = KNNBasic(sim_options={"user_based": True})
+    knn.fit(trainset)
+    model = knn
+
+
+def retrain_cf_model(since=None):
+    user_ids, movie_ids, scores, max_id = load_feedback_arrays(since=since)
+    train_cf_model(user_ids, movie_ids, scores)
+
+    # Only full-history models are valid starting points for a warm restart
+    if since is None and model is not None:
+        snapshot.maybe_save_snapshot(model, CF_BACKEND, movie_ids, scores, max_id)
+
+
+def retrain_in_background():
+    """Start retrain_cf_model() in a thread unless one is already running."""
+    if not _retrain_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            retrain_cf_model()
+        finally:
+            _retrain_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def update_cf_model(user_id):
+    """
+    Bring CF up to date after new feedback from `user_id`. KNN is refit
+    synchronously as before; ALS re-solves just this user against the
+    current item factors and refits in the background on an interval.
+    """
+    if CF_BACKEND != "als":
+        retrain_cf_model()
+        return
+
+    current = model
+    if isinstance(current, ImplicitALS):
+        user_ids, movie_ids, scores, _ = load_feedback_arrays(user_ids=[user_id])
+        with _fold_lock:
+            current.fold_in(user_ids, movie_ids, scores)
+
+    if current is None or time.time() - _last_train >= ALS_RETRAIN_INTERVAL_SECONDS:
+        retrain_in_background()
 
 
 def get_cf_score(user_id, movie_id):
     if model is None:
         return 0.0
+    if isinstance(model, ImplicitALS):
+        return model.score(user_id, movie_id)
     try:
         prediction = model.predict(user_id, movie_id)
         return prediction.est
     except Exception:
         return 0.0
 
+
+def recommend_cf(user_id, top_k=10):
+    """
+    Retrieve CF candidates for a user straight from the item-factor index.
+    Only the ALS backend supports this; KNN returns no candidates.
+    """
+    if not isinstance(model, ImplicitALS):
+        return []
+    return model.recommend(user_id, top_k=top_k)
@@ -1,6 +1,7 @@
 import random
 from collections import defaultdict
-from . import recommender, cf
+import numpy as np
+from . import recommender, cf, snapshot
 
 # Global bandit storage (in-memory for now)
 bandit_counts = defaultdict(int)   # how many times a movie was shown
@@ -18,6 +19,49 @@ def update_bandit(movie_id: int, reward: float):
     bandit_rewards[movie_id] += reward
 
 
+def load_bandit_arrays(movie_ids, counts, rewards):
+    """Replace bandit stats with per-movie arrays (e.g. from a snapshot)."""
+    bandit_counts.clear()
+    bandit_rewards.clear()
+    bandit_counts.update(zip(movie_ids.tolist(), counts.tolist()))
+    bandit_rewards.update(zip(movie_ids.tolist(), rewards.tolist()))
+
+
+def warm_start():
+    """
+    Restore CF and bandit state from the latest snapshot, then replay only
+    feedback rows newer than it. Without a snapshot, train from scratch once
+    and write the first one.
+    """
+    state = snapshot.load_latest_snapshot(cf.CF_BACKEND)
+    if state is None:
+        user_ids, movie_ids, scores, max_id = cf.load_feedback_arrays()
+        cf.train_cf_model(user_ids, movie_ids, scores)
+        load_bandit_arrays(*snapshot.bandit_arrays(movie_ids, scores))
+        if cf.model is not None:
+            snapshot.save_snapshot(cf.model, cf.CF_BACKEND, movie_ids, scores, max_id)
+        return
+
+    cf.model = state["model"]
+    load_bandit_arrays(state["bandit_movie_ids"], state["bandit_counts"], state["bandit_rewards"])
+
+    user_ids, movie_ids, scores, _ = cf.load_feedback_arrays(after_id=state["max_feedback_id"])
+    if len(user_ids) == 0:
+        return
+    print(f"Replaying {len(user_ids)} feedback rows newer than the CF snapshot...")
+
+    for movie_id, reward in zip(movie_ids.tolist(), scores.tolist()):
+        update_bandit(movie_id, reward)
+
+    if isinstance(cf.model, cf.ImplicitALS):
+        # Re-solve only the affected users against the snapshot's item factors
+        history = cf.load_feedback_arrays(user_ids=np.unique(user_ids))
+        cf.model.fold_in(*history[:3])
+    else:
+        # KNN cannot be updated incrementally; serve the snapshot while retraining
+        cf.retrain_in_background()
+
+
 def select_with_bandit(candidates, top_k=10):
     """
     Apply ε-Greedy to select recommendations from candidates.
@@ -37,7 +81,31 @@ def select_with_bandit(candidates, top_k=10):
     return final_results
 
 
-def hybrid_recommend(user_id: int, user_input: str, top_k: int = 10, alpha: float = 0.6):
+def popular_recommend(user_id: int, top_k: int = 10, filters: dict = None):
+    """
+    Cheap fallback ranking with no encoder call: catalog rating blended with
+    the bandit's average reward, using the same 0.9 / 0.1 split as below.
+    Used when the service is too busy for full hybrid recommendations.
+    Movies the user disliked are excluded, as in the full path.
+    """
+    scores = 0.9 * np.nan_to_num(recommender.catalog_ratings / 10.0)
+    for movie_id, count in list(bandit_counts.items()):
+        pos = recommender.position_of.get(movie_id)
+        if pos is not None and count:
+            scores[pos] += 0.1 * bandit_rewards[movie_id] / count
+
+    disliked_ids = recommender.get_disliked_ids(user_id)
+    mask = recommender.build_filter_mask(exclude_ids=disliked_ids, **(filters or {}))
+    if mask is not None:
+        scores = np.where(mask, scores, -np.inf)
+
+    k = min(top_k, len(scores))
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return [recommender.movie_result(pos, scores[pos]) for pos in best if np.isfinite(scores[pos])]
+
+
+def hybrid_recommend(user_id: int, user_input: str, top_k: int = 10, alpha: float = 0.6, filters: dict = None):
     """
     Combines BERT similarity and Collaborative Filtering scores with ε-Greedy Bandits.
     
@@ -47,23 +115,36 @@ def hybrid_recommend(user_id: int, user_input: str, top_k: int = 10, alpha: floa
         top_k (int): Number of recommendations to return.
         alpha (float): Weight for BERT score (0.0 to 1.0).
                        (1 - alpha) is used for collaborative score.
+        filters (dict): Optional genres / year_min / year_max / rating_min /
+                        rating_max constraints, applied inside the FAISS search.
     
     Returns:
         List of movie recommendations sorted by bandit-adjusted scores.
     """
-    # Step 1: Get semantic recommendations
-    bert_results = recommender.recommend_movies(user_input, top_k=20)
-    hybrid_results = []
-    
     # Get disliked movie IDs
     feedback_entries = recommender.get_user_feedback(user_id)
     disliked_ids = {f.movie_id for f in feedback_entries if f.feedback_type == "dislike"}
-    
+
+    # Step 1: Get semantic recommendations. Disliked movies and any requested
+    # filters are pushed into the search so every candidate slot is usable.
+    mask = recommender.build_filter_mask(exclude_ids=disliked_ids, **(filters or {}))
+    query = recommender.encode_query(user_input)
+    bert_results = recommender.recommend_by_vector(query, top_k=max(20, top_k), mask=mask)
+
+    # Step 2: Add candidates retrieved from the CF item factors (ALS backend only),
+    # scored against the same query so they compete on equal terms.
+    seen_ids = {r["id"] for r in bert_results}
+    for movie_id, _ in cf.recommend_cf(user_id, top_k=top_k):
+        pos = recommender.position_of.get(movie_id)
+        if pos is None or movie_id in seen_ids or (mask is not None and not mask[pos]):
+            continue
+        bert_results.append(recommender.movie_result(pos, recommender.embeddings[pos] @ query[0]))
+        seen_ids.add(movie_id)
+
+    hybrid_results = []
+
     for result in bert_results:
         movie_id = result["id"]
-        if movie_id in disliked_ids:
-            continue  # Skip disliked movies completely
-
         bert_score = result["score"]
         cf_score = cf.get_cf_score(user_id, movie_id)
         combined_score = alpha * bert_score + (1 - alpha) * cf_score
@@ -5,10 +5,13 @@ from .database import engine
 from .routers import user, auth
 from .routers import recommendation
 from .routers import feedback
-from . import recommender
+from . import recommender, taste, hybrid
 from .routers import tmdb
 
 models.Base.metadata.create_all(bind=engine)
+# create_all skips existing tables, so add indexes introduced later explicitly
+for table_index in models.Feedback.__table__.indexes:
+    table_index.create(bind=engine, checkfirst=True)
 
 app = FastAPI()
 
@@ -27,6 +30,18 @@ app.include_router(recommendation.router)
 app.include_router(feedback.router)
 app.include_router(tmdb.router)
 
+@app.on_event("startup")
+def load_user_tastes():
+    taste.load_tastes()
+
+@app.on_event("startup")
+def restore_cf_and_bandits():
+    hybrid.warm_start()
+
+@app.on_event("shutdown")
+def save_user_tastes():
+    taste.save_tastes()
+
 @app.get("/")
 def read_root():
     return {"message": "API is up and running!"}
@@ -13,7 +13,7 @@ class User(Base):
 class Feedback(Base):
     __tablename__ = "feedback"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))  # Reference to users table
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)  # Reference to users table
     movie_id = Column(Integer)  # You can keep this as int assuming movie IDs are unique
     feedback_type = Column(String)  # e.g. "like", "dislike", or "rating"
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -53,6 +53,129 @@ else:
     faiss.write_index(index, index_file)
     stored_ids = [m["id"] for m in movies]
 
+# ----------------------------
+# Catalog filter indexes
+# ----------------------------
+# Positions in these structures are FAISS ids (row order of `movies`).
+genre_bitmaps = {}      # lowercase genre -> bool mask over the catalog
+year_order = None       # positions sorted by year (missing years last)
+years_sorted = None
+rating_order = None     # positions sorted by rating
+ratings_sorted = None
+catalog_ratings = None  # rating per position (NaN if missing)
+position_of = {}        # movie id -> FAISS id
+
+# Below this many allowed rows, score the subset directly instead of
+# scanning the whole index with an IDSelector.
+SUBSET_SEARCH_MAX = 2048
+
+
+def _parse_genres(movie):
+    return [g.strip().lower() for g in (movie.get("genres") or "").split(",") if g.strip()]
+
+
+def build_filter_indexes():
+    global genre_bitmaps, year_order, years_sorted, rating_order, ratings_sorted, catalog_ratings, position_of
+
+    n = len(movies)
+    bitmaps = {}
+    for pos, movie in enumerate(movies):
+        for genre in _parse_genres(movie):
+            if genre not in bitmaps:
+                bitmaps[genre] = np.zeros(n, dtype=bool)
+            bitmaps[genre][pos] = True
+
+    years = np.array([m["year"] if m.get("year") is not None else np.nan for m in movies], dtype=np.float32)
+    ratings = np.array([m["rating"] if m.get("rating") is not None else np.nan for m in movies], dtype=np.float32)
+
+    # Stable argsort keeps NaN (missing values) at the end, so range lookups
+    # with searchsorted never match them.
+    year_order = np.argsort(years, kind="stable")
+    years_sorted = years[year_order]
+    rating_order = np.argsort(ratings, kind="stable")
+    ratings_sorted = ratings[rating_order]
+    catalog_ratings = ratings
+    genre_bitmaps = bitmaps
+    position_of = {m["id"]: pos for pos, m in enumerate(movies)}
+
+
+def _range_mask(order, values_sorted, low, high):
+    lo = 0 if low is None else np.searchsorted(values_sorted, low, side="left")
+    if high is None:
+        hi = np.searchsorted(values_sorted, np.nan, side="left")  # exclude missing values
+    else:
+        hi = np.searchsorted(values_sorted, high, side="right")
+    mask = np.zeros(len(order), dtype=bool)
+    mask[order[lo:hi]] = True
+    return mask
+
+
+def build_filter_mask(genres=None, year_min=None, year_max=None,
+                      rating_min=None, rating_max=None, exclude_ids=None):
+    """
+    Combine the precomputed indexes into a boolean mask over the catalog.
+    A movie matches if it has any of `genres` and falls inside the year and
+    rating ranges (bounds inclusive). Returns None when nothing is filtered.
+    """
+    mask = None
+
+    if genres:
+        mask = np.zeros(len(movies), dtype=bool)
+        for genre in genres:
+            bitmap = genre_bitmaps.get(genre.strip().lower())
+            if bitmap is not None:
+                mask |= bitmap
+
+    if year_min is not None or year_max is not None:
+        year_mask = _range_mask(year_order, years_sorted, year_min, year_max)
+        mask = year_mask if mask is None else mask & year_mask
+
+    if rating_min is not None or rating_max is not None:
+        rating_mask = _range_mask(rating_order, ratings_sorted, rating_min, rating_max)
+        mask = rating_mask if mask is None else mask & rating_mask
+
+    if exclude_ids:
+        excluded = [position_of[i] for i in exclude_ids if i in position_of]
+        if excluded:
+            if mask is None:
+                mask = np.ones(len(movies), dtype=bool)
+            mask[excluded] = False
+
+    return mask
+
+
+def search(query, top_k, mask=None):
+    """
+    Inner-product search for a normalized (1, d) query. When `mask` is given
+    only allowed movies are considered, so up to `top_k` matches are always
+    returned. Returns (scores, indices) for the single query.
+    """
+    if mask is None:
+        scores, indices = index.search(query, top_k)
+        keep = indices[0] >= 0
+        return scores[0][keep], indices[0][keep]
+
+    allowed = np.flatnonzero(mask)
+    if len(allowed) == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    k = min(top_k, len(allowed))
+
+    if len(allowed) <= SUBSET_SEARCH_MAX:
+        # Pre-masked subset search: exact scores over the allowed rows only
+        subset_scores = embeddings[allowed] @ query[0]
+        best = np.argpartition(-subset_scores, k - 1)[:k]
+        best = best[np.argsort(-subset_scores[best])]
+        return subset_scores[best], allowed[best]
+
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    scores, indices = index.search(query, k, params=faiss.SearchParameters(sel=selector))
+    keep = indices[0] >= 0
+    return scores[0][keep], indices[0][keep]
+
+
+build_filter_indexes()
+
 # ----------------------------
 # Update function for new movies
 # ----------------------------
@@ -89,6 +212,7 @@ def update_faiss_index():
     np.save(embeddings_file, embeddings)
     np.save(ids_file, stored_ids)
     faiss.write_index(index, index_file)
+    build_filter_indexes()
 
     print("FAISS index updated successfully!")
 
@@ -101,44 +225,40 @@ def get_user_feedback(user_id):
     db.close()
     return feedback_entries
 
+
+def get_disliked_ids(user_id):
+    db = SessionLocal()
+    rows = db.query(models.Feedback.movie_id).filter(
+        models.Feedback.user_id == user_id,
+        models.Feedback.feedback_type == "dislike"
+    ).all()
+    db.close()
+    return {row.movie_id for row in rows}
+
 # ----------------------------
 # Recommendations
 # ----------------------------
-def recommend_movies(user_input, user_id=None, top_k=10):
-    # Encode query
-    user_embedding = model.encode(user_input, convert_to_numpy=True)
-    faiss.normalize_L2(user_embedding.reshape(1, -1))
-
-    # Search in FAISS index
-    scores, indices = index.search(user_embedding.reshape(1, -1), top_k)
-    scores, indices = scores[0], indices[0]
-
-    results = []
-    for score, idx in zip(scores, indices):
-        movie = movies[int(idx)]
-        final_score = float(score)
-
-        # Personalization via feedback
-        if user_id is not None:
-            feedback_entries = get_user_feedback(user_id)
-            liked_ids = {f.movie_id for f in feedback_entries if f.feedback_type == "like"}
-            disliked_ids = {f.movie_id for f in feedback_entries if f.feedback_type == "dislike"}
-
-            if movie["id"] in liked_ids:
-                final_score += 0.1
-            elif movie["id"] in disliked_ids:
-                final_score -= 0.1
-
-        results.append({
-            "id": movie["id"],
-            "title": movie["title"],
-            "year": movie.get("year"),
-            "description": movie["description"],
-            "poster_path": movie.get("poster_path"),
-            "rating": movie.get("rating"),
-            "score": round(final_score, 3)
-        })
-
-    # Sort after personalization
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:top_k]
+def encode_query(user_input):
+    """Encode a text query into a normalized (1, d) vector."""
+    user_embedding = model.encode(user_input, convert_to_numpy=True).reshape(1, -1)
+    faiss.normalize_L2(user_embedding)
+    return user_embedding
+
+
+def movie_result(idx, score):
+    movie = movies[int(idx)]
+    return {
+        "id": movie["id"],
+        "title": movie["title"],
+        "year": movie.get("year"),
+        "description": movie["description"],
+        "poster_path": movie.get("poster_path"),
+        "rating": movie.get("rating"),
+        "score": round(float(score), 3)
+    }
+
+
+def recommend_by_vector(vector, top_k=10, mask=None):
+    """Search with an already normalized (1, d) vector; no encoder call."""
+    scores, indices = search(vector, top_k, mask=mask)
+    return [movie_result(idx, score) for score, idx in zip(scores, indices)]
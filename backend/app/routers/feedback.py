@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from .. import models, schemas
-from .. import database, cf
+from .. import database, cf, taste, admission
 from ..hybrid import update_bandit, bandit_counts, bandit_rewards  # import bandit stats
 import json
 import os
@@ -40,13 +40,19 @@ def give_feedback(feedback: schemas.FeedbackCreate, db: Session = Depends(databa
     db.commit()
     db.refresh(feedback_entry)
 
-    # Retrain CF model
-    cf.retrain_cf_model()
+    # Update CF model
+    cf.update_cf_model(feedback.user_id)
 
     # Update Bandit with reward
     reward = feedback_to_reward(feedback.feedback_type)
     update_bandit(feedback.movie_id, reward)
 
+    # Fold into the user's taste vector
+    taste.update_taste(feedback.user_id, feedback.movie_id, feedback.feedback_type, feedback_entry.id)
+
+    # Cached recommendations may include the movie just rated
+    admission.result_cache.evict_user(feedback.user_id)
+
     return {"message": "Feedback recorded successfully"}
 
 
@@ -66,12 +72,18 @@ def track_click(user_id: int, movie_id: int, db: Session = Depends(database.get_
     db.commit()
     db.refresh(feedback)
 
-    # Retrain CF model
-    cf.retrain_cf_model()
+    # Update CF model
+    cf.update_cf_model(user_id)
 
     # Update Bandit with reward for click
     update_bandit(movie_id, 0.8)
 
+    # Fold into the user's taste vector
+    taste.update_taste(user_id, movie_id, "click", feedback.id)
+
+    # Cached recommendations were computed before this click
+    admission.result_cache.evict_user(user_id)
+
     return {"message": "Click tracked"}
 
 
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Body
+import time
+from fastapi import APIRouter, Body, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from fastapi import APIRouter, Body
-from .. import hybrid
+from typing import List, Optional
+from .. import admission, hybrid, taste
 
 router = APIRouter()
 
@@ -10,6 +12,137 @@ class RecommendationRequest(BaseModel):
     user_input: str
     user_id: int  # For personalizing recommendations
 
+
+def _filters(genres, year_min, year_max, rating_min, rating_max):
+    # Optional filters are applied inside the vector search, so results still fill top_k
+    return {
+        "genres": genres,
+        "year_min": year_min,
+        "year_max": year_max,
+        "rating_min": rating_min,
+        "rating_max": rating_max,
+    }
+
+
+async def _run_limited(limiter, deadline, fn, reserve=0.0, **kwargs):
+    """Run `fn` in the threadpool if `limiter` admits it; None if shed."""
+    if not await limiter.acquire(deadline, reserve=reserve):
+        return None
+    start = time.monotonic()
+    try:
+        return await run_in_threadpool(fn, **kwargs)
+    finally:
+        limiter.release(time.monotonic() - start)
+
+
+def _served(response: Response, tier: str, results):
+    admission.record_tier(tier)
+    response.headers["X-Served-Tier"] = tier
+    return results
+
+
+def _rejected():
+    admission.record_tier("rejected")
+    return HTTPException(
+        status_code=503,
+        detail="Recommendation service is overloaded, please retry shortly",
+        headers={"Retry-After": str(admission.RETRY_AFTER_SECONDS)},
+    )
+
+
 @router.post("/recommend/")
-def get_recommendations(user_input: str = Body(..., embed=True), user_id: int = Body(...)):
-    return hybrid.hybrid_recommend(user_id=user_id, user_input=user_input)
\ No newline at end of file
+async def get_recommendations(
+    response: Response,
+    user_input: str = Body(..., embed=True),
+    user_id: int = Body(...),
+    genres: Optional[List[str]] = Body(None),
+    year_min: Optional[int] = Body(None),
+    year_max: Optional[int] = Body(None),
+    rating_min: Optional[float] = Body(None),
+    rating_max: Optional[float] = Body(None),
+):
+    filters = _filters(genres, year_min, year_max, rating_min, rating_max)
+    deadline = time.monotonic() + admission.DEADLINE_SECONDS
+    cache_key = (user_id, user_input, tuple(genres or ()), year_min, year_max, rating_min, rating_max)
+
+    # Shed early enough that the popularity fallback can still finish in time
+    results = await _run_limited(
+        admission.full_limiter, deadline, hybrid.hybrid_recommend,
+        reserve=admission.degraded_limiter.service_estimate,
+        user_id=user_id, user_input=user_input, filters=filters
+    )
+    if results is not None:
+        admission.result_cache.put(cache_key, results)
+        return _served(response, "full", results)
+
+    # Saturated: degrade to cheaper tiers before rejecting
+    results = admission.result_cache.get(cache_key)
+    if results is not None:
+        return _served(response, "cache", results)
+
+    results = await _run_limited(
+        admission.degraded_limiter, deadline, hybrid.popular_recommend,
+        user_id=user_id, filters=filters
+    )
+    if results is not None:
+        return _served(response, "popular", results)
+
+    raise _rejected()
+
+
+@router.get("/recommend/stats")
+def get_recommendation_stats():
+    """Counts of requests served by each tier, plus limiter settings."""
+    return admission.stats()
+
+
+@router.post("/recommend/for-you/")
+async def get_for_you(
+    response: Response,
+    user_id: int = Body(..., embed=True),
+    user_input: Optional[str] = Body(None),
+    top_k: int = Body(10, ge=1, le=100),
+    query_weight: float = Body(0.3, ge=0.0, le=1.0),
+    genres: Optional[List[str]] = Body(None),
+    year_min: Optional[int] = Body(None),
+    year_max: Optional[int] = Body(None),
+    rating_min: Optional[float] = Body(None),
+    rating_max: Optional[float] = Body(None),
+):
+    # Single FAISS search on the user's taste vector; the encoder only runs if user_input is given
+    filters = _filters(genres, year_min, year_max, rating_min, rating_max)
+    kwargs = dict(user_id=user_id, user_input=user_input, top_k=top_k,
+                  query_weight=query_weight, filters=filters)
+
+    if not user_input:
+        # Cheap path, no admission needed
+        results = await run_in_threadpool(taste.recommend_for_user, **kwargs)
+        if results is None:
+            raise HTTPException(status_code=404, detail="No taste profile for this user yet")
+        return _served(response, "full", results)
+
+    # With a query this runs the encoder, so it goes through the same tiers as /recommend/
+    deadline = time.monotonic() + admission.DEADLINE_SECONDS
+    cache_key = (user_id, "for-you", user_input, top_k, query_weight,
+                 tuple(genres or ()), year_min, year_max, rating_min, rating_max)
+
+    results = await _run_limited(
+        admission.full_limiter, deadline, taste.recommend_for_user,
+        reserve=admission.degraded_limiter.service_estimate, **kwargs
+    )
+    if results is not None:
+        admission.result_cache.put(cache_key, results)
+        return _served(response, "full", results)
+
+    results = admission.result_cache.get(cache_key)
+    if results is not None:
+        return _served(response, "cache", results)
+
+    results = await _run_limited(
+        admission.degraded_limiter, deadline, hybrid.popular_recommend,
+        user_id=user_id, top_k=top_k, filters=filters
+    )
+    if results is not None:
+        return _served(response, "popular", results)
+
+    raise _rejected()
@@ -0,0 +1,124 @@
+import glob
+import os
+import pickle
+import threading
+import time
+import numpy as np
+from . import models, database
+
+# ----------------------------
+# CF + bandit snapshots
+# ----------------------------
+# Each snapshot holds a trained CF model and the bandit arrays derived from
+# the same feedback rows, tagged with the highest Feedback.id included.
+# On boot the newest one is loaded and only newer rows are replayed.
+FORMAT_VERSION = 2
+
+# State derived from the database lives outside the source tree (and out of
+# the Docker image); by default <project root>/data, i.e. /app/data in Docker.
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DATA_DIR = os.getenv("RECOSTREAM_DATA_DIR", os.path.join(project_root, "data"))
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "60"))
+KEEP_SNAPSHOTS = 3
+
+_lock = threading.Lock()
+_last_save = 0.0
+_database_identity = None
+
+
+def database_identity():
+    """
+    Fingerprint of the feedback table: id and timestamp of its first row.
+    Saved state is only reused against the database it was built from, so
+    a snapshot copied from another environment is never replayed onto
+    different data. None while the table is empty.
+    """
+    global _database_identity
+
+    if _database_identity is None:
+        db = database.SessionLocal()
+        try:
+            first = db.query(models.Feedback.id, models.Feedback.timestamp).order_by(models.Feedback.id).first()
+        finally:
+            db.close()
+        if first is not None:
+            _database_identity = f"{first.id}:{first.timestamp.isoformat() if first.timestamp else ''}"
+    return _database_identity
+
+
+def bandit_arrays(movie_ids, scores):
+    """Per-movie (ids, counts, total rewards) for a batch of feedback rows."""
+    ids, inverse = np.unique(np.asarray(movie_ids), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(ids)).astype(np.int64)
+    rewards = np.bincount(inverse, weights=scores, minlength=len(ids))
+    return ids, counts, rewards
+
+
+def _snapshot_path(backend, max_feedback_id):
+    return os.path.join(SNAPSHOT_DIR, f"cf-{backend}-{max_feedback_id:012d}.pkl")
+
+
+def save_snapshot(model, backend, movie_ids, scores, max_feedback_id):
+    """Write a snapshot atomically (temp file + rename) and prune old ones."""
+    global _last_save
+
+    bandit_ids, bandit_counts, bandit_rewards = bandit_arrays(movie_ids, scores)
+    state = {
+        "version": FORMAT_VERSION,
+        "backend": backend,
+        "max_feedback_id": int(max_feedback_id),
+        "database": database_identity(),
+        "created_at": time.time(),
+        "model": model,
+        "bandit_movie_ids": bandit_ids,
+        "bandit_counts": bandit_counts,
+        "bandit_rewards": bandit_rewards,
+    }
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(backend, max_feedback_id)
+    with _lock:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _last_save = time.time()
+
+        for old in _list_snapshots(backend)[:-KEEP_SNAPSHOTS]:
+            os.remove(old)
+
+
+def maybe_save_snapshot(model, backend, movie_ids, scores, max_feedback_id):
+    """Save unless a snapshot was written within SNAPSHOT_INTERVAL_SECONDS."""
+    if max_feedback_id is None or time.time() - _last_save < SNAPSHOT_INTERVAL_SECONDS:
+        return
+    try:
+        save_snapshot(model, backend, movie_ids, scores, max_feedback_id)
+    except OSError as e:
+        print(f"Could not write CF snapshot: {e}")
+
+
+def _list_snapshots(backend):
+    # Zero-padded ids make lexical order match feedback order
+    return sorted(glob.glob(os.path.join(SNAPSHOT_DIR, f"cf-{backend}-*.pkl")))
+
+
+def load_latest_snapshot(backend):
+    """Return the newest readable snapshot for `backend`, or None."""
+    for path in reversed(_list_snapshots(backend)):
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"Skipping unreadable snapshot {path}: {e}")
+            continue
+        if state.get("version") != FORMAT_VERSION or state.get("backend") != backend:
+            continue
+        if state.get("database") != database_identity():
+            print(f"Ignoring snapshot {path}: it was built from a different database")
+            continue
+        return state
+    return None
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+import faiss
+import numpy as np
+from sqlalchemy import select
+from . import recommender, models, database, snapshot
+
+# ----------------------------
+# User taste vectors
+# ----------------------------
+# Each user's taste is a weighted running mean of the embeddings of movies
+# they interacted with: likes and clicks pull it towards a movie, dislikes
+# push it away. We keep the weighted sum and total weight so every feedback
+# event is a single O(d) update.
+TASTE_WEIGHTS = {"like": 1.0, "click": 0.5, "dislike": -1.0}
+
+taste_file = os.path.join(snapshot.DATA_DIR, "user_tastes.npz")
+SAVE_INTERVAL_SECONDS = 30
+YIELD_PER = 10000
+
+taste_sums = {}     # user id -> float32 weighted sum of movie embeddings
+taste_weights = {}  # user id -> total absolute weight seen
+max_feedback_id = 0  # highest Feedback.id folded in; rows above it are replayed on load
+_lock = threading.Lock()
+_last_save = 0.0
+
+
+def _apply(user_id, movie_id, feedback_type, feedback_id=None):
+    global max_feedback_id
+
+    if feedback_id is not None:
+        max_feedback_id = max(max_feedback_id, feedback_id)
+    weight = TASTE_WEIGHTS.get(feedback_type)
+    pos = recommender.position_of.get(movie_id)
+    if weight is None or pos is None:
+        return False
+
+    row = recommender.embeddings[pos]
+    if user_id not in taste_sums:
+        taste_sums[user_id] = np.zeros(row.shape[0], dtype=np.float32)
+        taste_weights[user_id] = 0.0
+    taste_sums[user_id] += weight * row
+    taste_weights[user_id] += abs(weight)
+    return True
+
+
+def update_taste(user_id: int, movie_id: int, feedback_type: str, feedback_id: int = None):
+    """
+    Fold one feedback event into the user's taste vector and persist
+    the table if the last save is older than SAVE_INTERVAL_SECONDS.
+    Events not saved yet are replayed from the feedback table on load.
+    """
+    with _lock:
+        changed = _apply(user_id, movie_id, feedback_type, feedback_id)
+        if changed and time.time() - _last_save >= SAVE_INTERVAL_SECONDS:
+            _write_tastes()
+
+
+def get_taste_vector(user_id: int):
+    """Return the user's normalized taste vector, or None if unknown/neutral."""
+    with _lock:
+        total = taste_sums.get(user_id)
+        weight = taste_weights.get(user_id, 0.0)
+        if total is None or weight == 0.0:
+            return None
+        vector = total / weight
+
+    norm = np.linalg.norm(vector)
+    if norm == 0.0:
+        return None
+    return (vector / norm).astype(np.float32)
+
+
+# ----------------------------
+# Persistence
+# ----------------------------
+def save_tastes():
+    """Write all taste vectors as float16 rows to a single .npz (atomic replace)."""
+    with _lock:
+        _write_tastes()
+
+
+def _write_tastes():
+    # Caller holds _lock, so only one writer touches the temp file at a time
+    global _last_save
+
+    user_ids = np.fromiter(taste_sums.keys(), dtype=np.int64, count=len(taste_sums))
+    weights = np.array([taste_weights[u] for u in user_ids.tolist()], dtype=np.float32)
+    if len(user_ids):
+        means = np.vstack([taste_sums[u] / max(taste_weights[u], 1e-6) for u in user_ids.tolist()])
+    else:
+        means = np.zeros((0, recommender.embeddings.shape[1]), dtype=np.float32)
+
+    os.makedirs(os.path.dirname(taste_file), exist_ok=True)
+    tmp_file = f"{taste_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(f, user_ids=user_ids, means=means.astype(np.float16), weights=weights,
+                 max_feedback_id=np.int64(max_feedback_id), database=str(snapshot.database_identity()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, taste_file)
+    _last_save = time.time()
+
+
+def load_tastes():
+    """
+    Load taste vectors from disk and replay feedback rows newer than the
+    file; rebuild everything from the feedback table if it is missing.
+    """
+    global taste_sums, taste_weights, max_feedback_id
+
+    if not os.path.exists(taste_file):
+        rebuild_tastes_from_db()
+        return
+
+    sums, weights = {}, {}
+    try:
+        with np.load(taste_file) as data:
+            saved_id = int(data["max_feedback_id"])
+            if str(data["database"]) != str(snapshot.database_identity()):
+                raise ValueError("built from a different database")
+            for user_id, mean, weight in zip(data["user_ids"].tolist(), data["means"], data["weights"].tolist()):
+                sums[user_id] = mean.astype(np.float32) * weight
+                weights[user_id] = weight
+    except Exception as e:
+        print(f"Could not read {taste_file} ({e}); rebuilding taste vectors...")
+        rebuild_tastes_from_db()
+        return
+
+    with _lock:
+        taste_sums, taste_weights, max_feedback_id = sums, weights, saved_id
+    _replay(after_id=saved_id)
+
+
+def rebuild_tastes_from_db():
+    global taste_sums, taste_weights, max_feedback_id
+
+    with _lock:
+        taste_sums, taste_weights, max_feedback_id = {}, {}, 0
+    _replay()
+
+
+def _replay(after_id=None):
+    """Stream feedback rows (newer than `after_id`) in id order and fold them in."""
+    stmt = select(
+        models.Feedback.id, models.Feedback.user_id, models.Feedback.movie_id, models.Feedback.feedback_type
+    ).order_by(models.Feedback.id).execution_options(yield_per=YIELD_PER)
+    if after_id is not None:
+        stmt = stmt.where(models.Feedback.id > after_id)
+
+    replayed = 0
+    db = database.SessionLocal()
+    try:
+        for batch in db.execute(stmt).partitions():
+            with _lock:
+                for feedback_id, user_id, movie_id, feedback_type in batch:
+                    _apply(user_id, movie_id, feedback_type, feedback_id)
+            replayed += len(batch)
+    finally:
+        db.close()
+
+    if replayed:
+        save_tastes()
+
+
+# ----------------------------
+# "For you" retrieval
+# ----------------------------
+def recommend_for_user(user_id: int, user_input: str = None, top_k: int = 10,
+                       query_weight: float = 0.3, filters: dict = None):
+    """
+    Retrieve movies with a single FAISS search on the user's taste vector.
+
+    Parameters:
+        user_id (int): ID of the user.
+        user_input (str): Optional query; only then is the encoder called.
+        top_k (int): Number of recommendations to return.
+        query_weight (float): Share of the query vector when blending (0.0 to 1.0).
+        filters (dict): Optional catalog filters, as for hybrid recommendations.
+
+    Returns:
+        List of movies, or None if the user has no taste vector and no query.
+    """
+    vector = get_taste_vector(user_id)
+
+    if user_input:
+        query = recommender.encode_query(user_input)[0]
+        vector = query if vector is None else (1 - query_weight) * vector + query_weight * query
+    if vector is None:
+        return None
+
+    vector = vector.reshape(1, -1).astype(np.float32)
+    faiss.normalize_L2(vector)
+
+    # Skip movies the user already rated or clicked
+    seen_ids = {f.movie_id for f in recommender.get_user_feedback(user_id)}
+    mask = recommender.build_filter_mask(exclude_ids=seen_ids, **(filters or {}))
+    return recommender.recommend_by_vector(vector, top_k=top_k, mask=mask)
@@ -0,0 +1,78 @@
+"""
+Compare training time and peak memory of the CF backends on synthetic data.
+
+    python bench_cf.py --users 100000 --knn-users 5000
+
+KNNBasic builds a dense users x users similarity matrix, so by default it is
+trained on a smaller sample of users and its cost at the full size is
+extrapolated quadratically. Pass --knn-users equal to --users to measure it
+directly (about 80 GB of similarities at 100k users).
+"""
+import argparse
+import os
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# app.cf imports the DB layer; an in-memory engine is enough here
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import cf  # noqa: E402
+from surprise import Dataset, Reader, KNNBasic  # noqa: E402
+
+
+def synthetic_feedback(n_users, n_items, per_user, seed=0):
+    rng = np.random.default_rng(seed)
+    # Popularity-skewed items, like/click/dislike in roughly real proportions
+    popularity = 1.0 / np.arange(1, n_items + 1) ** 0.8
+    popularity /= popularity.sum()
+    user_ids = np.repeat(np.arange(1, n_users + 1), per_user)
+    movie_ids = rng.choice(n_items, size=len(user_ids), p=popularity) + 1
+    scores = rng.choice([1.0, 0.8, 0.0], size=len(user_ids), p=[0.3, 0.6, 0.1]).astype(np.float32)
+    return user_ids, movie_ids, scores
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--items", type=int, default=3000)
+    parser.add_argument("--per-user", type=int, default=20)
+    parser.add_argument("--knn-users", type=int, default=5000)
+    args = parser.parse_args()
+
+    user_ids, movie_ids, scores = synthetic_feedback(args.users, args.items, args.per_user)
+    print(f"{args.users} users, {args.items} items, {len(user_ids)} feedback rows")
+
+    als = cf.ImplicitALS()
+    seconds, mb = measure(lambda: als.fit(user_ids, movie_ids, scores))
+    print(f"ALS      users={args.users:>7}  train={seconds:8.1f}s  peak={mb:9.1f} MB")
+
+    knn_users = min(args.knn_users, args.users)
+    sample = user_ids <= knn_users
+    df = pd.DataFrame({"user_id": user_ids[sample], "movie_id": movie_ids[sample], "feedback": scores[sample]})
+
+    def fit_knn():
+        data = Dataset.load_from_df(df, Reader(rating_scale=(0, 1)))
+        KNNBasic(sim_options={"user_based": True}, verbose=False).fit(data.build_full_trainset())
+
+    seconds, mb = measure(fit_knn)
+    print(f"KNNBasic users={knn_users:>7}  train={seconds:8.1f}s  peak={mb:9.1f} MB")
+
+    if knn_users < args.users:
+        scale = (args.users / knn_users) ** 2
+        print(f"KNNBasic users={args.users:>7}  train~{seconds * scale:8.1f}s  peak~{mb * scale:9.1f} MB (extrapolated)")
+
+
+if __name__ == "__main__":
+    main()
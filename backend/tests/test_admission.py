@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from app.admission import AdmissionController, ResultCache
+
+
+def _burst(limiter, elapsed):
+    """Admit a full batch of requests and finish them all after `elapsed` seconds."""
+    async def run():
+        deadline = time.monotonic() + 10.0
+        for _ in range(limiter.max_concurrent):
+            assert await limiter.acquire(deadline)
+        for _ in range(limiter.max_concurrent):
+            limiter.release(elapsed)
+
+    asyncio.run(run())
+
+
+def test_estimate_is_capped():
+    limiter = AdmissionController(4, 0, max_estimate=1.0)
+    _burst(limiter, elapsed=30.0)
+    assert limiter.service_estimate == 1.0
+
+
+def test_recovers_after_burst():
+    # Without the cap this burst pushes the estimate well past the deadline
+    limiter = AdmissionController(4, 4)
+    _burst(limiter, elapsed=10.0)
+    assert limiter.service_estimate > 2.0
+
+    async def run():
+        admitted = []
+        for _ in range(20):
+            ok = await limiter.acquire(time.monotonic() + 2.0)
+            admitted.append(ok)
+            if ok:
+                limiter.release(0.05)
+        return admitted
+
+    admitted = asyncio.run(run())
+    # An idle limiter always lets the request through, and the estimate heals
+    assert all(admitted)
+    assert limiter.service_estimate < 0.2
+
+
+def test_sheds_when_busy_and_out_of_time():
+    limiter = AdmissionController(1, 4, initial_estimate=1.0)
+
+    async def run():
+        deadline = time.monotonic() + 0.5
+        assert await limiter.acquire(deadline)  # idle, so admitted
+        shed = not await limiter.acquire(deadline)
+        limiter.release()
+        return shed
+
+    assert asyncio.run(run())
+
+
+def test_sheds_when_queue_full():
+    limiter = AdmissionController(1, 0)
+
+    async def run():
+        deadline = time.monotonic() + 10.0
+        assert await limiter.acquire(deadline)
+        shed = not await limiter.acquire(deadline)
+        limiter.release()
+        return shed
+
+    assert asyncio.run(run())
+
+
+def test_cache_evicts_only_that_user():
+    cache = ResultCache()
+    cache.put((1, "space"), ["a"])
+    cache.put((1, "for-you", "space"), ["b"])
+    cache.put((2, "space"), ["c"])
+    cache.evict_user(1)
+    assert cache.get((1, "space")) is None
+    assert cache.get((1, "for-you", "space")) is None
+    assert cache.get((2, "space")) == ["c"]
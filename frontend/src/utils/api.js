@@ -309,7 +309,8 @@ export const endpoints = {
   me: () => api.get('/user/me'),
   
   // Recommendations - Single endpoint for all recommendation types
-  getRecommendations: (user_input, user_id) => api.post('/recommend/', { user_input, user_id }),
+  getRecommendations: (user_input, user_id, filters = {}) => api.post('/recommend/', { user_input, user_id, ...filters }),
+  getForYou: (user_id, user_input = null, filters = {}) => api.post('/recommend/for-you/', { user_id, user_input, ...filters }),
   
   // Feedback
   submitFeedback: (data) => api.post('/feedback/', data),